@@ -253,7 +253,7 @@ class ChatClient:
                 "receiver": "",
                 "text": ""
             }
-            self.client_socket.send(json.dumps(quit_message).encode('utf-8'))
+            self.client_socket.send((json.dumps(quit_message) + '\n').encode('utf-8'))
         except:
             pass
         
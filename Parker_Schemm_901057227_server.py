@@ -3,12 +3,41 @@ import threading
 import json
 import sys
 
+# Largest frame (in bytes) the server will buffer before dropping the client
+MAX_FRAME_SIZE = 65536
+
+class TCPTransport:
+    """Default transport that listens on a real TCP socket"""
+    
+    def listen(self, host, port):
+        """Bind and listen on host:port, returning an object with accept() and close()"""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            server_socket.bind((host, port))
+            server_socket.listen(5)
+        except:
+            server_socket.close()
+            raise
+        return server_socket
+
+class ClientSession:
+    """Per-connection state: the socket, the registered username and unread bytes"""
+    
+    def __init__(self, client_socket, client_address):
+        self.socket = client_socket
+        self.address = client_address
+        self.username = None
+        self.buffer = b''
+        self.closed = False
+
 class ChatServer:
-    def __init__(self, host='127.0.0.1', port=5555):
+    def __init__(self, host='127.0.0.1', port=5555, transport=None):
         self.host = host
         self.port = port
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Anything with listen(host, port) -> listener; sockets only need send/recv/close
+        self.transport = transport if transport is not None else TCPTransport()
+        self.server_socket = None
         
         # Dictionary to store connected clients {username: socket}
         self.clients = {}
@@ -20,8 +49,7 @@ class ChatServer:
     def start(self):
         """Start the server and listen for connections"""
         try:
-            self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(5)
+            self.server_socket = self.transport.listen(self.host, self.port)
             print(f"[SERVER] Server started on {self.host}:{self.port}")
             print("[SERVER] Waiting for connections...")
             
@@ -39,80 +67,162 @@ class ChatServer:
                 
         except KeyboardInterrupt:
             print("\n[SERVER] Shutting down server...")
-            self.server_socket.close()
         except Exception as e:
             print(f"[SERVER ERROR] {e}")
-            self.server_socket.close()
+        finally:
+            if self.server_socket is not None:
+                self.server_socket.close()
     
     def handle_client(self, client_socket, client_address):
         """Handle communication with a connected client"""
-        username = None
+        session = ClientSession(client_socket, client_address)
         
         try:
-            # Receive username from client
-            username_data = client_socket.recv(1024).decode('utf-8')
-            username = username_data.strip()
-            
-            if not username:
-                client_socket.close()
-                return
-            
-            # Register the client
-            with self.lock:
-                if username in self.clients:
-                    error_msg = json.dumps({
-                        "status": "error",
-                        "sender": "SERVER",
-                        "receiver": username,
-                        "text": "Username already taken. Please try another."
-                    })
-                    client_socket.send((error_msg + '\n').encode('utf-8'))
-                    client_socket.close()
-                    return
-                
-                self.clients[username] = client_socket
-                print(f"[SERVER] User '{username}' registered successfully")
-            
-            # Send success confirmation
-            welcome_msg = json.dumps({
-                "status": "success",
-                "sender": "SERVER",
-                "receiver": username,
-                "text": f"Welcome to ClassChat, {username}!"
-            })
-            client_socket.send((welcome_msg + '\n').encode('utf-8'))
-            
-            # Listen for messages from this client
-            while True:
-                message_data = client_socket.recv(4096).decode('utf-8')
+            while not session.closed:
+                data = client_socket.recv(4096)
+                self.receive_data(session, data)
                 
-                if not message_data:
+                if not data:
                     break
-                
-                # Handle multiple messages or partial messages
-                message_data = message_data.strip()
-                if not message_data:
-                    continue
-                
-                # Parse JSON message
-                try:
-                    message = json.loads(message_data)
-                    self.process_message(message, username)
-                except json.JSONDecodeError as je:
-                    print(f"[SERVER ERROR] JSON decode error: {je}")
-                    error_msg = json.dumps({
-                        "status": "error",
-                        "sender": "SERVER",
-                        "receiver": username,
-                        "text": "Invalid message format"
-                    })
-                    client_socket.send((error_msg + '\n').encode('utf-8'))
                     
         except Exception as e:
-            print(f"[SERVER ERROR] Error handling client {username}: {e}")
+            print(f"[SERVER ERROR] Error handling client {session.username}: {e}")
         finally:
             # Clean up when client disconnects
-            self.disconnect_client(username)
+            self.close_session(session)
+    
+    def receive_data(self, session, data):
+        """Buffer bytes read from a client and process every complete frame.
+        
+        Frames are newline-delimited. An empty read means the peer closed the
+        connection, in which case any unterminated trailing frame is processed too.
+        This holds no socket of its own, so it can be driven without real I/O.
+        """
+        if session.closed:
+            return
+        
+        session.buffer += data
+        frames = session.buffer.split(b'\n')
+        session.buffer = frames.pop()
+        if not data:
+            frames.append(session.buffer)
+            session.buffer = b''
+        
+        for frame in frames:
+            if session.closed:
+                return
+            self.process_frame(session, frame)
+        
+        if len(session.buffer) > MAX_FRAME_SIZE:
+            self.reject_oversized(session)
+    
+    def process_frame(self, session, frame):
+        """Handle one newline-delimited frame: the username first, then JSON messages"""
+        if len(frame) > MAX_FRAME_SIZE:
+            self.reject_oversized(session)
+            return
+        
+        try:
+            frame = frame.decode('utf-8').strip()
+        except UnicodeDecodeError:
+            frame = None
+        
+        if session.username is None:
+            self.register_client(session, frame)
+            return
+        
+        if frame == '':
+            return
+        
+        # Parse JSON message
+        message = None
+        if frame is not None:
+            try:
+                message = json.loads(frame)
+            except (ValueError, RecursionError) as je:
+                # ValueError covers JSONDecodeError and over-long integers; RecursionError deep nesting
+                print(f"[SERVER ERROR] JSON decode error: {je}")
+        
+        if not isinstance(message, dict) or not isinstance(message.get('receiver', ''), str):
+            self.send_session_error(session, "Invalid message format")
+            return
+        
+        self.process_message(message, session.username)
+        
+        # A 'quit' removes the client; stop reading from this connection
+        if self.clients.get(session.username) is not session.socket:
+            session.closed = True
+    
+    def register_client(self, session, username):
+        """Register the username sent as the first frame of a connection"""
+        if not username:
+            self.close_session(session)
+            return
+        
+        with self.lock:
+            if username in self.clients:
+                error_msg = json.dumps({
+                    "status": "error",
+                    "sender": "SERVER",
+                    "receiver": username,
+                    "text": "Username already taken. Please try another."
+                })
+                try:
+                    session.socket.send((error_msg + '\n').encode('utf-8'))
+                except:
+                    pass
+                self.close_session(session)
+                return
+            
+            self.clients[username] = session.socket
+            session.username = username
+            print(f"[SERVER] User '{username}' registered successfully")
+        
+        # Send success confirmation
+        welcome_msg = json.dumps({
+            "status": "success",
+            "sender": "SERVER",
+            "receiver": username,
+            "text": f"Welcome to ClassChat, {username}!"
+        })
+        try:
+            session.socket.send((welcome_msg + '\n').encode('utf-8'))
+        except:
+            pass
+    
+    def reject_oversized(self, session):
+        """Drop a client whose frame exceeds MAX_FRAME_SIZE, whether or not it was terminated"""
+        print(f"[SERVER ERROR] Frame from {session.address} exceeds {MAX_FRAME_SIZE} bytes")
+        self.send_session_error(session, "Message too large")
+        self.close_session(session)
+    
+    def send_session_error(self, session, text):
+        """Send an error frame straight to a session's socket"""
+        error_msg = json.dumps({
+            "status": "error",
+            "sender": "SERVER",
+            "receiver": session.username,
+            "text": text
+        })
+        try:
+            session.socket.send((error_msg + '\n').encode('utf-8'))
+        except:
+            pass
+    
+    def close_session(self, session):
+        """Close a session's connection; safe to call more than once.
+        
+        A session that already quit is marked closed, so disconnect_client runs once.
+        """
+        if session.closed:
+            return
+        session.closed = True
+        if session.username is not None:
+            self.disconnect_client(session.username, session.socket)
+        try:
+            session.socket.close()
+        except:
+            pass
     
     def process_message(self, message, sender):
         """Process different types of messages"""
@@ -314,11 +424,15 @@ class ChatServer:
                 
                 print(f"[SERVER] User '{sender}' joined chat room '{room_name}'")
     
-    def disconnect_client(self, username):
-        """Handle client disconnection"""
+    def disconnect_client(self, username, client_socket=None):
+        """Handle client disconnection.
+        
+        When client_socket is given, the user is only removed if still registered
+        on that socket, so a late cleanup cannot evict someone who reused the name.
+        """
         if username:
             with self.lock:
-                if username in self.clients:
+                if username in self.clients and (client_socket is None or self.clients[username] is client_socket):
                     # Remove from active clients
                     try:
                         self.clients[username].close()
@@ -0,0 +1,551 @@
+import contextlib
+import heapq
+import io
+import json
+import random
+import sys
+import threading
+import time
+
+from Parker_Schemm_901057227_server import ChatServer, TCPTransport, ClientSession, MAX_FRAME_SIZE
+
+class VirtualClock:
+    """Clock that only moves when told to, so replays do not wait on real time"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def advance_to(self, when):
+        if when > self.now:
+            self.now = when
+
+class FakeSocket:
+    """In-memory stand-in for a connected client socket.
+
+    Bytes the server sends are kept in `sent` as (virtual_time, data) pairs.
+    recv() blocks until feed() or hangup(), so the threaded server loop also works.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sent = []
+        self.inbox = []
+        self.hung_up = False
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def send(self, data):
+        with self.condition:
+            if self.closed:
+                raise OSError("send on closed fake socket")
+            self.sent.append((self.clock.time(), data))
+        return len(data)
+
+    def feed(self, data):
+        """Queue bytes for the server to read"""
+        with self.condition:
+            self.inbox.append(data)
+            self.condition.notify_all()
+
+    def recv(self, bufsize):
+        with self.condition:
+            while not self.inbox and not self.hung_up and not self.closed:
+                self.condition.wait()
+            if not self.inbox:
+                return b''
+            data = self.inbox[0][:bufsize]
+            rest = self.inbox[0][bufsize:]
+            if rest:
+                self.inbox[0] = rest
+            else:
+                self.inbox.pop(0)
+            return data
+
+    def hangup(self):
+        """Close the client end; the server reads EOF once the inbox is drained"""
+        with self.condition:
+            self.hung_up = True
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def messages(self):
+        """Decode every newline-delimited JSON frame the server has sent"""
+        data = b''.join(chunk for _, chunk in self.sent)
+        return [json.loads(line) for line in data.decode('utf-8').splitlines() if line.strip()]
+
+class FakeListener:
+    """Listener returned by FakeNetwork.listen(); accept() hands out queued connections"""
+
+    def __init__(self):
+        self.pending = []
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def accept(self):
+        with self.condition:
+            while not self.pending and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                raise OSError("accept on closed fake listener")
+            return self.pending.pop(0)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class FakeNetwork:
+    """Transport for ChatServer that keeps all traffic in memory.
+
+    Pass it as ChatServer(transport=FakeNetwork()) to run the threaded server
+    without real sockets; connect() then returns the client end of a connection.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock if clock is not None else VirtualClock()
+        self.listener = None
+        self.next_port = 40000
+
+    def listen(self, host, port):
+        self.listener = FakeListener()
+        return self.listener
+
+    def connect(self):
+        fake_socket = FakeSocket(self.clock)
+        with self.listener.condition:
+            self.next_port += 1
+            self.listener.pending.append((fake_socket, ('fake', self.next_port)))
+            self.listener.condition.notify_all()
+        return fake_socket
+
+class RecordingTransport:
+    """Wrap another transport and log every connection, read and close to a trace.
+
+    Each event is a dict {"t", "conn", "event", "data"} with t in seconds since
+    the listener opened; save() writes them as JSON lines for replay(). Every
+    connection ends with exactly one 'close' event, flagged "reset" when the
+    connection ended without the server reading EOF (an error or a server-side close).
+    """
+
+    def __init__(self, inner=None):
+        self.inner = inner if inner is not None else TCPTransport()
+        self.events = []
+        self.lock = threading.Lock()
+        self.started = None
+        self.next_conn = 0
+
+    def listen(self, host, port):
+        listener = self.inner.listen(host, port)
+        self.started = time.monotonic()
+        return _RecordingListener(self, listener)
+
+    def record(self, conn, event, data=b'', reset=False):
+        event = {
+            "t": time.monotonic() - self.started,
+            "conn": conn,
+            "event": event,
+            "data": data.decode('latin-1')
+        }
+        if reset:
+            event["reset"] = True
+        with self.lock:
+            self.events.append(event)
+
+    def save(self, path):
+        with self.lock:
+            with open(path, 'w') as trace_file:
+                for event in self.events:
+                    trace_file.write(json.dumps(event) + '\n')
+
+class _RecordingListener:
+    def __init__(self, recorder, listener):
+        self.recorder = recorder
+        self.listener = listener
+
+    def accept(self):
+        client_socket, client_address = self.listener.accept()
+        with self.recorder.lock:
+            conn = self.recorder.next_conn
+            self.recorder.next_conn += 1
+        self.recorder.record(conn, 'connect')
+        return _RecordingSocket(self.recorder, conn, client_socket), client_address
+
+    def close(self):
+        self.listener.close()
+
+class _RecordingSocket:
+    def __init__(self, recorder, conn, client_socket):
+        self.recorder = recorder
+        self.conn = conn
+        self.socket = client_socket
+        self.close_recorded = False
+
+    def record_close(self, reset):
+        if not self.close_recorded:
+            self.close_recorded = True
+            self.recorder.record(self.conn, 'close', reset=reset)
+
+    def recv(self, bufsize):
+        try:
+            data = self.socket.recv(bufsize)
+        except:
+            self.record_close(reset=True)
+            raise
+        if data:
+            self.recorder.record(self.conn, 'data', data)
+        else:
+            self.record_close(reset=False)
+        return data
+
+    def send(self, data):
+        return self.socket.send(data)
+
+    def close(self):
+        self.record_close(reset=True)
+        self.socket.close()
+
+def load_trace(path):
+    """Read a JSON-lines trace written by RecordingTransport.save()"""
+    with open(path) as trace_file:
+        return [json.loads(line) for line in trace_file if line.strip()]
+
+class Simulation:
+    """Drive a ChatServer's core single-threaded from a schedule of virtual-time events.
+
+    No threads or sockets are involved: every event calls straight into
+    ChatServer.receive_data, so the same schedule always gives the same result.
+    As in handle_client, an exception from the server closes only that connection;
+    it is kept in `errors` as (conn, repr) instead of stopping the run.
+    """
+
+    def __init__(self, server=None, clock=None):
+        self.clock = clock if clock is not None else VirtualClock()
+        self.server = server if server is not None else ChatServer(transport=FakeNetwork(self.clock))
+        self.sessions = {}
+        self.queue = []
+        self.sequence = 0
+        self.errors = []
+
+    def schedule(self, when, conn, event, data=b''):
+        """Queue a 'connect', 'data', 'close' or 'reset' event for connection conn.
+
+        'close' is an EOF read, which also processes any unterminated frame;
+        'reset' drops the connection without reading anything further.
+        """
+        heapq.heappush(self.queue, (when, self.sequence, conn, event, data))
+        self.sequence += 1
+
+    def load(self, events):
+        for event in events:
+            kind = 'reset' if event['event'] == 'close' and event.get('reset') else event['event']
+            self.schedule(event['t'], event['conn'], kind, event.get('data', '').encode('latin-1'))
+
+    def connect(self, conn):
+        session = ClientSession(FakeSocket(self.clock), ('sim', conn))
+        self.sessions[conn] = session
+        return session
+
+    def deliver(self, conn, data):
+        """Hand bytes from connection conn to the server, connecting it first if needed"""
+        session = self.sessions.get(conn) or self.connect(conn)
+        try:
+            self.server.receive_data(session, data)
+        except Exception as e:
+            print(f"[SERVER ERROR] Error handling client {session.username}: {e}")
+            self.errors.append((conn, repr(e)))
+            data = b''
+        if not data:
+            self.server.close_session(session)
+
+    def step(self):
+        when, _, conn, event, data = heapq.heappop(self.queue)
+        self.clock.advance_to(when)
+        if event == 'connect':
+            self.connect(conn)
+        elif event == 'data':
+            self.deliver(conn, data)
+        elif event == 'close':
+            self.deliver(conn, b'')
+        elif event == 'reset':
+            session = self.sessions.get(conn) or self.connect(conn)
+            self.server.close_session(session)
+
+    def run(self):
+        """Process every scheduled event in time order; return the number processed"""
+        count = 0
+        while self.queue:
+            self.step()
+            count += 1
+        return count
+
+    def check_invariants(self):
+        """Return a list of inconsistencies in the server's client and room tables"""
+        problems = []
+        for room_name, members in self.server.chat_rooms.items():
+            if len(members) != len(set(members)):
+                problems.append(f"Duplicate members in '{room_name}'")
+            for member in members:
+                if member not in self.server.clients:
+                    problems.append(f"'{member}' is in '{room_name}' but not connected")
+        for username, client_socket in self.server.clients.items():
+            if getattr(client_socket, 'closed', False):
+                problems.append(f"'{username}' is registered on a closed socket")
+        return problems
+
+class CountingChatServer(ChatServer):
+    """ChatServer that logs every disconnect_client call as (username, socket)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.disconnect_calls = []
+
+    def disconnect_client(self, username, client_socket=None):
+        self.disconnect_calls.append((username, client_socket))
+        super().disconnect_client(username, client_socket)
+
+def replay(events):
+    """Replay a recorded trace; return (simulation, events processed, wall seconds)"""
+    simulation = Simulation()
+    simulation.load(events)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        count = simulation.run()
+    return simulation, count, time.perf_counter() - started
+
+class ProtocolFuzzer:
+    """Feed random malformed, fragmented and oversized frames into a Simulation.
+
+    Every case is timed with perf_counter and divided by the number of frames it
+    delivered, so per-frame processing cost can be compared between cases and
+    runs; the same seed always produces the same input.
+    """
+
+    CASES = ('valid', 'malformed', 'non_object', 'bad_fields', 'bad_utf8', 'fragmented', 'deep_nesting', 'long_number',
+             'oversized', 'oversized_line', 'reconnect')
+
+    def __init__(self, seed=0, clients=4):
+        self.random = random.Random(seed)
+        clock = VirtualClock()
+        self.simulation = Simulation(CountingChatServer(transport=FakeNetwork(clock)), clock)
+        self.usernames = [f"user{i}" for i in range(clients)]
+        self.rooms = ['room0', 'room1', 'room2']
+        self.timings = {case: [] for case in self.CASES}
+        self.frames = {case: 0 for case in self.CASES}
+        self.failures = []
+        self.next_conn = 0
+        self.conns = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for username in self.usernames:
+                self.login(username)
+
+    def login(self, username):
+        conn = self.next_conn
+        self.next_conn += 1
+        self.conns[username] = conn
+        self.simulation.deliver(conn, (username + '\n').encode('utf-8'))
+
+    def valid_message(self):
+        status = self.random.choice(['private', 'group', 'create', 'join', 'quit', 'unknown'])
+        if status == 'private':
+            receiver = self.random.choice(self.usernames + ['nobody'])
+        else:
+            receiver = self.random.choice(self.rooms)
+        message = {"status": status, "receiver": receiver, "text": "x" * self.random.randint(0, 64)}
+        return (json.dumps(message) + '\n').encode('utf-8')
+
+    def split_reads(self, data):
+        """Deliver data in one read or in 4096-byte reads like handle_client"""
+        if self.random.random() < 0.5:
+            return [data]
+        return [data[i:i + 4096] for i in range(0, len(data), 4096)]
+
+    def generate(self, case):
+        """Return a list of chunks to deliver for the given case"""
+        if case == 'valid':
+            return [self.valid_message()]
+        if case == 'malformed':
+            frame = self.valid_message()
+            cut = self.random.randint(1, len(frame) - 2)
+            return [frame[:cut] + b'\n']
+        if case == 'non_object':
+            return [self.random.choice([b'5\n', b'null\n', b'"quit"\n', b'[1, 2]\n'])]
+        if case == 'bad_fields':
+            receiver = self.random.choice([[1], {"a": 1}, 7, None])
+            return [(json.dumps({"status": "join", "receiver": receiver}) + '\n').encode('utf-8')]
+        if case == 'bad_utf8':
+            return [b'\xff\xfe{"status": "group"}\n']
+        if case == 'fragmented':
+            data = b''.join(self.valid_message() for _ in range(self.random.randint(1, 4)))
+            cuts = sorted(self.random.sample(range(1, len(data)), min(3, len(data) - 1)))
+            return [data[i:j] for i, j in zip([0] + cuts, cuts + [len(data)])]
+        if case == 'deep_nesting':
+            opener, closer = self.random.choice([(b'[', b']'), (b'{"a": ', b'}')])
+            # Deep enough to exhaust the decoder's recursion, small enough to stay under MAX_FRAME_SIZE
+            depth = self.random.randint(1000, (MAX_FRAME_SIZE - 1) // (len(opener) + len(closer)))
+            return self.split_reads(opener * depth + b'0' + closer * depth + b'\n')
+        if case == 'long_number':
+            digits = b'1' * self.random.randint(4301, 60000)
+            if self.random.random() < 0.5:
+                return self.split_reads(digits + b'\n')
+            return self.split_reads(b'{"status": "join", "receiver": "room0", "text": ' + digits + b'}\n')
+        if case == 'oversized':
+            return self.split_reads(b'{"status": "group", "text": "' + b'A' * (MAX_FRAME_SIZE + 1))
+        if case == 'oversized_line':
+            return self.split_reads(b'{"status": "group", "text": "' + b'A' * (MAX_FRAME_SIZE + 1) + b'"}\n')
+        return []
+
+    def run_reconnect(self, username):
+        """Log username in on a new connection before the old one's EOF arrives.
+
+        Either the old connection quits first, and the new login must survive
+        both the old EOF and a late cleanup of the old socket, or it does not,
+        and the new login must be refused. Either way the old connection must
+        cause exactly one disconnect_client call. Returns (problems, frames delivered).
+        """
+        server = self.simulation.server
+        old_conn = self.conns[username]
+        old_socket = server.clients[username]
+        quit_first = self.random.random() < 0.5
+        calls_before = len(server.disconnect_calls)
+
+        frames = 2
+        if quit_first:
+            self.simulation.deliver(old_conn, b'{"status": "quit"}\n')
+            frames += 1
+        self.login(username)
+        new_socket = self.simulation.sessions[self.conns[username]].socket
+        self.simulation.deliver(old_conn, b'')
+
+        problems = []
+        calls = len(server.disconnect_calls) - calls_before
+        if calls != 1:
+            problems.append(f"disconnect_client called {calls} times for one connection")
+        if quit_first:
+            # A late cleanup of the old socket must not evict the new login
+            server.disconnect_client(username, old_socket)
+            if server.clients.get(username) is not new_socket:
+                problems.append(f"'{username}' lost its new connection to the old one's cleanup")
+        elif username in server.clients:
+            problems.append(f"'{username}' still registered after its only connection closed")
+        return problems, frames
+
+    def run_case(self, case):
+        username = self.random.choice(self.usernames)
+        conn = self.conns[username]
+        chunks = self.generate(case)
+        sent_before = len(self.simulation.sessions[conn].socket.sent)
+        # An unterminated frame still counts as one
+        frames = max(1, b''.join(chunks).count(b'\n'))
+        problems = []
+        errors_before = len(self.simulation.errors)
+        started = time.perf_counter()
+        try:
+            if case == 'reconnect':
+                problems, frames = self.run_reconnect(username)
+            for chunk in chunks:
+                self.simulation.deliver(conn, chunk)
+        except Exception as e:
+            problems.append(repr(e))
+        self.timings[case].append((time.perf_counter() - started) / frames)
+        self.frames[case] += frames
+        problems += [error for _, error in self.simulation.errors[errors_before:]]
+        for problem in problems:
+            self.failures.append((case, chunks, problem))
+
+        if case.startswith('oversized') and username in self.simulation.server.clients:
+            self.failures.append((case, chunks, f"'{username}' still connected after an oversized frame"))
+
+        if case in ('deep_nesting', 'long_number'):
+            replies = [json.loads(chunk) for _, chunk in self.simulation.sessions[conn].socket.sent[sent_before:]]
+            if username not in self.simulation.server.clients:
+                self.failures.append((case, chunks, f"'{username}' disconnected by unparseable JSON"))
+            elif [reply.get('text') for reply in replies] != ["Invalid message format"]:
+                self.failures.append((case, chunks, f"expected 'Invalid message format', got {replies!r}"))
+
+        # Log back in anyone the case disconnected so later cases have a peer
+        if username not in self.simulation.server.clients:
+            self.login(username)
+
+        for problem in self.simulation.check_invariants():
+            self.failures.append((case, chunks, problem))
+
+    def run(self, iterations=1000):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(iterations):
+                self.run_case(self.random.choice(self.CASES))
+        return self.report()
+
+    def report(self):
+        """Return {case: {"count", "frames", "mean_us", "max_us"}} for every case that ran.
+
+        count is the number of cases run; mean_us and max_us are per frame.
+        """
+        stats = {}
+        for case, samples in self.timings.items():
+            if samples:
+                stats[case] = {
+                    "count": len(samples),
+                    "frames": self.frames[case],
+                    "mean_us": sum(samples) / len(samples) * 1e6,
+                    "max_us": max(samples) * 1e6
+                }
+        return stats
+
+def main():
+    usage = ("Usage:\n"
+             "  python Parker_Schemm_901057227_simulation.py fuzz [SEED] [ITERATIONS]\n"
+             "  python Parker_Schemm_901057227_simulation.py record <HOST> <PORT> <TRACE>\n"
+             "  python Parker_Schemm_901057227_simulation.py replay <TRACE>")
+
+    if len(sys.argv) < 2:
+        print(usage)
+        return 1
+
+    command = sys.argv[1]
+
+    if command == 'fuzz':
+        seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+        iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+        fuzzer = ProtocolFuzzer(seed)
+        stats = fuzzer.run(iterations)
+        print(f"[FUZZ] seed={seed} iterations={iterations}")
+        for case, row in stats.items():
+            print(f"  {case:<14} n={row['count']:<6} frames={row['frames']:<6} "
+                  f"mean={row['mean_us']:9.1f}us/frame  max={row['max_us']:9.1f}us/frame")
+        for case, chunks, problem in fuzzer.failures:
+            print(f"[FUZZ FAILURE] {case}: {problem} input={chunks!r:.200}")
+        return 1 if fuzzer.failures else 0
+
+    if command == 'record' and len(sys.argv) == 5:
+        recorder = RecordingTransport()
+        server = ChatServer(sys.argv[2], int(sys.argv[3]), transport=recorder)
+        server.start()
+        if recorder.started is None:
+            # start() already printed why listening failed; keep any existing trace
+            return 1
+        recorder.save(sys.argv[4])
+        print(f"[SERVER] Recorded {len(recorder.events)} events to {sys.argv[4]}")
+        return 0
+
+    if command == 'replay' and len(sys.argv) == 3:
+        events = load_trace(sys.argv[2])
+        simulation, count, elapsed = replay(events)
+        duration = events[-1]['t'] if events else 0.0
+        speedup = duration / elapsed if elapsed > 0 else float('inf')
+        print(f"[REPLAY] {count} events, {duration:.2f}s of traffic in {elapsed:.4f}s ({speedup:.0f}x real time)")
+        for problem in simulation.check_invariants():
+            print(f"[REPLAY ERROR] {problem}")
+        return 0
+
+    print(usage)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())